@@ -1,7 +1,21 @@
 import os
+import re
 import sys
+import json
+import time
+import base64
+import socket
+import hashlib
+import functools
 import logging
+import shutil
+import subprocess
+import tempfile
+import urllib.error
+import urllib.parse
+import urllib.request
 from pathlib import Path
+from typing import Dict, List, Tuple
 
 try:
     import pypandoc
@@ -19,9 +33,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+CACHE_DIR = Path.home() / '.cache' / 'md_to_word'
 
+
+@functools.lru_cache(maxsize=1)
 def ensure_pandoc_available() -> None:
-    """Ensure pandoc is available. Try to download a private copy if missing."""
+    """Ensure pandoc is available. Try to download a private copy if missing.
+
+    成功结果会被缓存，同一进程内只检查一次；失败（抛出异常）不缓存。
+    """
     if pypandoc is None:
         raise RuntimeError(
             "缺少依赖: pypandoc 未安装。请先运行 `pip install -r requirements.txt`。"
@@ -40,10 +60,76 @@ def ensure_pandoc_available() -> None:
             ) from e
 
 
-def convert_markdown_to_docx(input_md: str, output_docx: str) -> None:
+# Extra args: enable common extensions and smart punctuation
+PANDOC_FROM = "markdown+emoji+autolink_bare_uris+lists_without_preceding_blankline"
+PANDOC_EXTRA_ARGS = [
+    "--to=docx",
+    "--standalone",
+    "--toc",  # generate table of contents if headings present
+    "--toc-depth=3",
+    "--markdown-headings=setext",
+    "--wrap=auto",
+    "--quiet",
+]
+
+# Markdown 中的图片引用：行内 ![a](path) / ![a](<带空格的 path>)、引用式 ![a][ref] / ![ref]、HTML <img src>
+_INLINE_IMAGE_RE = re.compile(r'!\[[^\]]*\]\(\s*(?:<([^>\n]+)>|([^)\s]+))')
+_REF_IMAGE_RE = re.compile(r'!\[([^\]]*)\](?:\[([^\]]*)\])?(?!\()')
+_REF_DEF_RE = re.compile(r'^ {0,3}\[([^\]]+)\]:\s*(?:<([^>\n]+)>|(\S+))', re.MULTILINE)
+_HTML_IMAGE_RE = re.compile(r'<img\b[^>]*?\bsrc\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE)
+
+
+def _image_refs(text: str) -> List[str]:
+    """All image targets referenced by the Markdown text, in order of appearance."""
+    refs = [a or b for a, b in _INLINE_IMAGE_RE.findall(text)]
+
+    definitions = {label.strip().lower(): a or b for label, a, b in _REF_DEF_RE.findall(text)}
+    for alt, label in _REF_IMAGE_RE.findall(text):
+        target = definitions.get((label or alt).strip().lower())
+        if target:
+            refs.append(target)
+
+    refs.extend(_HTML_IMAGE_RE.findall(text))
+    return list(dict.fromkeys(refs))
+
+
+def _local_images(input_path: Path, text: str) -> Tuple[Dict[str, Path], List[str]]:
+    """Resolve local image references relative to the Markdown file.
+
+    Returns ({引用: 文件路径}, [无法解析的本地引用])，网络图片会被忽略。
     """
-    Convert a Markdown file to a Word (.docx) file using pandoc.
+    found: Dict[str, Path] = {}
+    missing: List[str] = []
+    for ref in _image_refs(text):
+        if '://' in ref or ref.startswith('data:'):
+            continue
+        for candidate in (ref, urllib.parse.unquote(ref)):
+            image_path = input_path.parent / candidate
+            if image_path.is_file():
+                found[ref] = image_path
+                break
+        else:
+            missing.append(ref)
+    return found, missing
+
+
+def _cache_key(input_path: Path, source: bytes) -> str:
+    """Hash of the Markdown bytes, pandoc options/version, source directory and referenced images.
+
+    源目录参与计算，因为文中的相对图片路径依赖它；图片以大小和修改时间参与计算，
+    修改图片后缓存自动失效。
     """
+    h = hashlib.blake2b(source)
+    h.update(repr((PANDOC_FROM, PANDOC_EXTRA_ARGS, pypandoc.get_pandoc_version())).encode('utf-8'))
+    h.update(str(input_path.resolve().parent).encode('utf-8'))
+    images, _ = _local_images(input_path, source.decode('utf-8'))
+    for ref, image_path in sorted(images.items()):
+        st = image_path.stat()
+        h.update(f"{ref}\0{st.st_size}\0{st.st_mtime_ns}\0".encode('utf-8'))
+    return h.hexdigest()
+
+
+def _resolve_paths(input_md: str, output_docx: str) -> Tuple[Path, Path]:
     input_path = Path(input_md)
     if not input_path.exists():
         raise FileNotFoundError(f"输入文件不存在: {input_md}")
@@ -55,32 +141,214 @@ def convert_markdown_to_docx(input_md: str, output_docx: str) -> None:
         output_path = output_path.with_suffix('.docx')
     if not output_path.parent.exists():
         output_path.parent.mkdir(parents=True, exist_ok=True)
+    return input_path, output_path
 
-    ensure_pandoc_available()
 
-    # Extra args: enable common extensions and smart punctuation
-    extra_args = [
-        "--from=markdown+emoji+autolink_bare_uris+lists_without_preceding_blankline",
-        "--to=docx",
-        "--standalone",
-        "--toc",  # generate table of contents if headings present
-        "--toc-depth=3",
-        "--markdown-headings=setext",
-        "--wrap=auto",
-        "--quiet",
-    ]
+def _copy_from_cache(input_path: Path, source: bytes, output_path: Path) -> Tuple[bool, Path]:
+    """Copy a cached result to output_path. Returns (hit, cache file)."""
+    cached_file = CACHE_DIR / f"{_cache_key(input_path, source)}.docx"
+    if cached_file.exists():
+        shutil.copyfile(cached_file, output_path)
+        logger.info("命中缓存: %s -> %s", input_path.name, output_path)
+        return True, cached_file
+    return False, cached_file
+
 
-    # Perform conversion
-    pypandoc.convert_file(
-        source_file=str(input_path),
-        to='docx',
+def _store_in_cache(output_path: Path, cached_file: Path) -> None:
+    # 先写临时文件再原子替换，避免并发读取到写了一半的缓存
+    tmp_path = None
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+        os.close(fd)
+        shutil.copyfile(output_path, tmp_path)
+        os.replace(tmp_path, cached_file)
+    except OSError as e:
+        logger.warning("写入缓存失败: %s", e)
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _convert_with_cli(input_path: Path, text: str, output_path: Path) -> None:
+    """Convert already-loaded Markdown text; pandoc reads it from stdin instead of reopening the file."""
+    pypandoc.convert_text(
+        text,
+        'docx',
+        format=PANDOC_FROM,
         outputfile=str(output_path),
-        extra_args=extra_args,
+        # 文本经 stdin 传入，相对图片路径需按源文件目录解析
+        extra_args=PANDOC_EXTRA_ARGS + [f"--resource-path={input_path.parent}"],
     )
 
+
+def convert_markdown_to_docx(input_md: str, output_docx: str, use_cache: bool = True) -> None:
+    """
+    Convert a Markdown file to a Word (.docx) file using pandoc.
+
+    use_cache: 内容未变化时直接复制 ~/.cache/md_to_word/ 中的结果，跳过 pandoc。
+    """
+    input_path, output_path = _resolve_paths(input_md, output_docx)
+    source = input_path.read_bytes()
+
+    ensure_pandoc_available()
+
+    cached_file = None
+    if use_cache:
+        hit, cached_file = _copy_from_cache(input_path, source, output_path)
+        if hit:
+            return
+
+    _convert_with_cli(input_path, source.decode('utf-8'), output_path)
+
+    if cached_file is not None:
+        _store_in_cache(output_path, cached_file)
+
     logger.info("转换成功: %s -> %s", input_path.name, output_path)
 
 
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _start_pandoc_server(timeout: float = 10.0) -> Tuple[subprocess.Popen, int]:
+    """Start `pandoc server` on a free local port and wait until it accepts connections."""
+    port = _free_port()
+    proc = subprocess.Popen(
+        [pypandoc.get_pandoc_path(), 'server', f'--port={port}'],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("pandoc server 启动失败（需要 Pandoc 3.0 及以上版本）")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return proc, port
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("等待 pandoc server 启动超时")
+
+
+def _convert_via_server(port: int, text: str, images: Dict[str, Path], output_path: Path) -> None:
+    # pandoc server 无法读取文件系统，本地图片随请求一起发送
+    files = {ref: base64.b64encode(path.read_bytes()).decode('ascii') for ref, path in images.items()}
+
+    payload = {
+        "text": text,
+        "from": PANDOC_FROM,
+        "to": "docx",
+        "standalone": True,
+        "table-of-contents": True,
+        "toc-depth": 3,
+        "wrap": "auto",
+        "files": files,
+    }
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/",
+        data=json.dumps(payload).encode('utf-8'),
+        headers={'Content-Type': 'application/json', 'Accept': 'application/json'},
+    )
+    try:
+        with urllib.request.urlopen(request) as resp:
+            result = json.loads(resp.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(f"pandoc server 转换失败: {e.read().decode('utf-8', 'replace')}") from e
+
+    output = result["output"]
+    data = base64.b64decode(output) if result.get("base64") else output.encode('utf-8')
+    output_path.write_bytes(data)
+
+
+def convert_markdown_to_docx_batch(
+    inputs: List[str],
+    outputs: List[str],
+    use_cache: bool = True,
+) -> dict:
+    """
+    Convert many Markdown files with a single long-running `pandoc server`,
+    avoiding one pandoc process start per file.
+
+    若 pandoc server 不可用（如 Pandoc 版本低于 3.0），回退为逐个调用 pandoc。
+    返回 {'success': [...], 'failed': [...], 'total': n}。
+    """
+    if len(inputs) != len(outputs):
+        raise ValueError("输入与输出文件数量不一致")
+
+    results = {
+        'success': [],
+        'failed': [],
+        'total': len(inputs),
+    }
+
+    ensure_pandoc_available()
+
+    pending = []
+    for input_md, output_docx in zip(inputs, outputs):
+        try:
+            input_path, output_path = _resolve_paths(input_md, output_docx)
+            source = input_path.read_bytes()
+            cached_file = None
+            if use_cache:
+                hit, cached_file = _copy_from_cache(input_path, source, output_path)
+                if hit:
+                    results['success'].append(str(output_path))
+                    continue
+            pending.append((input_path, output_path, source.decode('utf-8'), cached_file))
+        except Exception as e:
+            logger.error("转换失败 %s: %s", input_md, e)
+            results['failed'].append(input_md)
+
+    if not pending:
+        return results
+
+    proc, port = None, 0
+    try:
+        proc, port = _start_pandoc_server()
+    except (OSError, RuntimeError) as e:
+        logger.warning("无法使用 pandoc server，改为逐个转换: %s", e)
+
+    try:
+        for input_path, output_path, text, cached_file in pending:
+            try:
+                converted = False
+                if proc is not None:
+                    images, missing = _local_images(input_path, text)
+                    if missing:
+                        # 与 convert_markdown_to_docx 保持一致：交给命令行按 --resource-path 解析
+                        logger.warning(
+                            "%s 中的图片无法解析: %s，改为调用 pandoc 命令行",
+                            input_path.name, ", ".join(missing),
+                        )
+                    else:
+                        try:
+                            _convert_via_server(port, text, images, output_path)
+                            converted = True
+                        except Exception as e:
+                            logger.warning("pandoc server 转换失败，改为逐个转换: %s", e)
+                            proc.kill()
+                            proc.wait()
+                            proc = None
+                if not converted:
+                    _convert_with_cli(input_path, text, output_path)
+                if cached_file is not None:
+                    _store_in_cache(output_path, cached_file)
+                logger.info("转换成功: %s -> %s", input_path.name, output_path)
+                results['success'].append(str(output_path))
+            except Exception as e:
+                logger.error("转换失败 %s: %s", input_path, e)
+                results['failed'].append(str(input_path))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    return results
+
+
 def main() -> int:
     if len(sys.argv) < 2:
         print("用法: python md_to_word.py <input.md> [output.docx]")
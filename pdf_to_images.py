@@ -1,26 +1,67 @@
+import io
 import os
 import sys
+import zlib
+import struct
+import functools
+import asyncio
 import logging
+import logging.handlers
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Callable, List, Optional, Tuple
 
 try:
     import fitz  # PyMuPDF
 except ImportError:
     fitz = None  # type: ignore
 
+try:
+    from PIL import Image
+except ImportError:
+    Image = None  # type: ignore
+
+try:
+    import fpnge
+except ImportError:
+    fpnge = None  # type: ignore
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None  # type: ignore
+
+try:
+    import imagecodecs
+except ImportError:
+    imagecodecs = None  # type: ignore
+
+
+_LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+# MemoryHandler 只负责缓存，真正写文件的是 target，所以格式要设置在 FileHandler 上
+_file_handler = logging.FileHandler('pdf_to_images.log', encoding='utf-8', delay=True)
+_file_handler.setFormatter(logging.Formatter(_LOG_FORMAT))
 
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
+    format=_LOG_FORMAT,
     handlers=[
-        logging.FileHandler('pdf_to_images.log', encoding='utf-8'),
+        # 日志先缓存在内存中，攒满 100 条或遇到 ERROR 时再写文件，减少与图片写盘争抢 I/O
+        logging.handlers.MemoryHandler(capacity=100, target=_file_handler),
         logging.StreamHandler(),
     ],
 )
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=128)
 def parse_page_range(page_range: Optional[str], page_count: int) -> Tuple[int, int]:
     """Parse page range like '1-5' (1-based inclusive). Returns 0-based [start, end).
     Empty or None means all pages.
@@ -44,24 +85,263 @@ def parse_page_range(page_range: Optional[str], page_count: int) -> Tuple[int, i
         raise ValueError(f"页码范围格式错误: '{page_range}'，示例：'1-5' 或 '3'") from exc
 
 
-def convert_pdf_to_images(
-    input_pdf: str,
-    output_dir: Optional[str] = None,
-    image_format: str = 'png',
-    zoom: float = 2.0,
-    page_range: Optional[str] = None,
-    jpg_quality: int = 92,
-    no_alpha: bool = True,
-) -> Path:
-    """Convert PDF pages to images.
+_worker_doc = None  # 每个工作进程各自打开的 PDF（fitz.Document 不能跨进程共享）
+_worker_matrix = None  # 与 _worker_doc 一起缓存的缩放矩阵
 
-    - image_format: 'png' or 'jpg'
-    - zoom: 1.0=72dpi 基础缩放，2.0≈144dpi，3.0≈216dpi
-    - page_range: 'start-end' or 'n' (1-based). None for all
-    - no_alpha: True to remove alpha channel (recommended for PNG)
 
-    Returns the output directory as Path.
+def _default_num_workers() -> int:
+    return min(os.cpu_count() or 1, 4)
+
+
+def _close_worker_doc() -> None:
+    global _worker_doc
+    if _worker_doc is not None:
+        _worker_doc.close()
+        _worker_doc = None
+
+
+_PIL_MODES = {1: 'L', 2: 'LA', 3: 'RGB', 4: 'RGBA'}
+
+
+_WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+
+
+def _write_file(out_path: str, data: bytes) -> None:
+    """Write encoded image bytes with os.write, bypassing Python's buffered io."""
+    fd = os.open(out_path, _WRITE_FLAGS, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        os.close(fd)
+
+
+# 超过该像素数的页面按行分段、多线程压缩（与 mtpng 思路相同）
+PNG_PARALLEL_MIN_PIXELS = 4_000_000
+_PNG_COLOR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}
+_png_pool: Optional[ThreadPoolExecutor] = None
+_png_pool_lock = threading.Lock()
+# 单张图片的压缩线程数；进程池中的每个工作进程会被设置为 CPU 核数 // 进程数
+_png_threads = os.cpu_count() or 1
+
+
+def _init_render_worker(png_threads: int) -> None:
+    global _png_threads
+    _png_threads = png_threads
+
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+
+def _deflate_part(data: memoryview, compress_level: int, last: bool) -> bytes:
+    # Z_FILTERED 适合经过 Up 滤波的数据；非最后一段以 Z_FULL_FLUSH 结束，各段可直接拼接
+    c = zlib.compressobj(compress_level, zlib.DEFLATED, -zlib.MAX_WBITS, 9, zlib.Z_FILTERED)
+    return c.compress(data) + c.flush(zlib.Z_FINISH if last else zlib.Z_FULL_FLUSH)
+
+
+def _pixmap_array(pix) -> "np.ndarray":
+    """View pixmap samples as an (height, width, channels) uint8 array without copying."""
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+
+
+def _encode_png_parallel(pix, compress_level: int) -> bytes:
+    """Encode a large pixmap as PNG, deflating row bands on several threads.
+
+    每行使用 Up 滤波（numpy 向量化计算），各段独立压缩后拼成一个 zlib 流；
+    zlib 压缩时释放 GIL，因此线程可以真正并行。
+    """
+    global _png_pool
+    parts = _png_threads
+    with _png_pool_lock:
+        if _png_pool is None:
+            _png_pool = ThreadPoolExecutor(max_workers=parts)
+
+    height, row_len = pix.height, pix.width * pix.n
+    rows = _pixmap_array(pix).reshape(height, row_len)
+    filtered = np.empty((height, row_len + 1), dtype=np.uint8)
+    filtered[:, 0] = 2  # PNG filter type: Up
+    filtered[0, 1:] = rows[0]
+    np.subtract(rows[1:], rows[:-1], out=filtered[1:, 1:])  # uint8 按 256 取模，正是 Up 滤波
+    raw = memoryview(filtered).cast('B')
+
+    band = -(-height // parts) * (row_len + 1)
+    futures = [
+        _png_pool.submit(_deflate_part, raw[off:off + band], compress_level, off + band >= len(raw))
+        for off in range(0, len(raw), band)
+    ]
+    idat = b''.join([b'\x78\x01'] + [f.result() for f in futures] + [struct.pack('>I', zlib.adler32(raw))])
+
+    ihdr = struct.pack('>IIBBBBB', pix.width, height, 8, _PNG_COLOR_TYPES[pix.n], 0, 0, 0)
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + _png_chunk(b'IHDR', ihdr)
+        + _png_chunk(b'IDAT', idat)
+        + _png_chunk(b'IEND', b'')
+    )
+
+
+def _encode_png(pix, compress_level: int) -> bytes:
+    """Encode pixmap as PNG with the given zlib level.
+
+    PyMuPDF 的 pix.tobytes 固定使用默认压缩级别，编码耗时远大于渲染；
+    有 Pillow 时改用 Pillow 编码以便指定 compress_level，
+    compress_level <= 1 且安装了 fpnge 时使用更快的 fpnge，否则优先使用 imagecodecs；
+    大于 PNG_PARALLEL_MIN_PIXELS 的页面优先多线程编码。
+    """
+    if np is not None and pix.width * pix.height >= PNG_PARALLEL_MIN_PIXELS and _png_threads > 1:
+        return _encode_png_parallel(pix, compress_level)
+    use_fpnge = fpnge is not None and Image is not None and compress_level <= 1
+    if not use_fpnge and imagecodecs is not None and np is not None:
+        return imagecodecs.png_encode(_pixmap_array(pix), level=compress_level)
+    if Image is None:
+        return pix.tobytes(output='png')
+
+    im = Image.frombytes(_PIL_MODES[pix.n], (pix.width, pix.height), pix.samples)
+    if use_fpnge:
+        return fpnge.fromPIL(im)
+    buf = io.BytesIO()
+    im.save(buf, 'PNG', compress_level=compress_level)
+    return buf.getvalue()
+
+
+def _encode_jpg(pix, jpg_quality: int) -> bytes:
+    """Encode pixmap as JPEG, using simplejpeg (libjpeg-turbo) when installed."""
+    if simplejpeg is None or np is None:
+        return pix.tobytes(output='jpg', jpg_quality=jpg_quality)
+
+    arr = _pixmap_array(pix)
+    # JPEG 不支持透明通道，去掉 alpha
+    color_n = pix.n - 1 if pix.alpha else pix.n
+    if color_n != pix.n:
+        arr = np.ascontiguousarray(arr[:, :, :color_n])
+    return simplejpeg.encode_jpeg(
+        arr,
+        quality=jpg_quality,
+        colorspace='GRAY' if color_n == 1 else 'RGB',
+        fastdct=True,
+    )
+
+
+def _encode_jxl(pix, quality: int) -> bytes:
+    """Encode pixmap as JPEG XL via imagecodecs (effort 3 favours speed)."""
+    return imagecodecs.jpegxl_encode(_pixmap_array(pix), level=quality, effort=3)
+
+
+@functools.lru_cache(maxsize=8)
+def _make_encoder(image_format: str, jpg_quality: int, png_compress_level: int) -> Callable[..., bytes]:
+    """Resolve the encoder for image_format once, so the per-page code does not branch on it."""
+    if image_format == 'png':
+        return functools.partial(_encode_png, compress_level=png_compress_level)
+    if image_format == 'jxl':
+        return functools.partial(_encode_jxl, quality=jpg_quality)
+    return functools.partial(_encode_jpg, jpg_quality=jpg_quality)
+
+
+def _save_pixmap(pix, out_path: str, encode: Callable[..., bytes]) -> None:
+    """Encode the whole image in memory, then write it with a single syscall."""
+    _write_file(out_path, encode(pix))
+
+
+def _render_page(args: Tuple[str, int, float, bool, str, str, int, int]) -> str:
+    """Render one page and save it. Runs inside a worker process.
+
+    args: (pdf_path, page_index, zoom, alpha, out_path, image_format, jpg_quality, png_compress_level)
     """
+    global _worker_doc, _worker_matrix
+    pdf_path, page_index, zoom, alpha, out_path, image_format, jpg_quality, png_compress_level = args
+
+    # 同一进程处理的多页复用一次 fitz.open 和同一个 Matrix
+    if _worker_doc is None or _worker_doc.name != pdf_path:
+        _close_worker_doc()
+        _worker_doc = fitz.open(pdf_path)
+    if _worker_matrix is None or _worker_matrix.a != zoom:
+        _worker_matrix = fitz.Matrix(zoom, zoom)
+
+    pix = _worker_doc.load_page(page_index).get_pixmap(
+        matrix=_worker_matrix, colorspace=fitz.csRGB, alpha=alpha
+    )
+    _save_pixmap(pix, out_path, _make_encoder(image_format, jpg_quality, png_compress_level))
+    return out_path
+
+
+def _log_export(out_path: str, done: int, total: int, log_every: int) -> None:
+    """Log every log_every-th page (and the last one) at INFO, the rest at DEBUG."""
+    level = logging.INFO if done % log_every == 0 or done == total else logging.DEBUG
+    logger.log(level, "导出: %s (%d/%d)", out_path, done, total)
+
+
+def _render_pipelined(
+    tasks: List[tuple],
+    num_writers: int = 2,
+    progress_cb: Optional[Callable[[int, int], None]] = None,
+    log_every: int = 10,
+) -> None:
+    """Render pages in the current thread while writer threads encode and save.
+
+    fitz.Document 只在当前线程内访问；渲染好的 pixmap 经有界队列交给写线程，
+    编码与写盘（Pillow/libpng 执行时释放 GIL）与下一页的渲染重叠进行。
+    """
+    if not tasks:
+        return
+    pdf_path, _, zoom, alpha, _, image_format, jpg_quality, png_compress_level = tasks[0]
+    encode = _make_encoder(image_format, jpg_quality, png_compress_level)
+    q: "queue.Queue" = queue.Queue(maxsize=4)
+    errors: List[Exception] = []
+    done_lock = threading.Lock()
+    done = 0
+
+    def writer() -> None:
+        nonlocal done
+        while True:
+            item = q.get()
+            if item is None:
+                return
+            pix, out_path = item
+            if errors:
+                continue  # 已出错：继续取出队列中的任务，避免渲染端阻塞
+            try:
+                _save_pixmap(pix, out_path, encode)
+                with done_lock:
+                    done += 1
+                    _log_export(out_path, done, len(tasks), log_every)
+                    if progress_cb is not None:
+                        progress_cb(done, len(tasks))
+            except Exception as exc:
+                errors.append(exc)
+
+    threads = [threading.Thread(target=writer, daemon=True) for _ in range(num_writers)]
+    for t in threads:
+        t.start()
+
+    try:
+        with fitz.open(pdf_path) as doc:
+            matrix = fitz.Matrix(zoom, zoom)
+            for task in tasks:
+                if errors:
+                    break
+                page_index, out_path = task[1], task[4]
+                pix = doc.load_page(page_index).get_pixmap(matrix=matrix, colorspace=fitz.csRGB, alpha=alpha)
+                q.put((pix, out_path))
+    finally:
+        for _ in threads:
+            q.put(None)
+        for t in threads:
+            t.join()
+
+    if errors:
+        raise errors[0]
+
+
+def jxl_available() -> bool:
+    """Whether jxl export is usable (imagecodecs built with JPEG XL, plus numpy)."""
+    return imagecodecs is not None and np is not None and bool(imagecodecs.JPEGXL.available)
+
+
+def _prepare_output(input_pdf: str, output_dir: Optional[str], image_format: str) -> Tuple[Path, Path, str]:
+    """Validate arguments, create the output directory and normalize image_format."""
     if fitz is None:
         raise RuntimeError("缺少依赖：未安装 PyMuPDF。请先运行 `pip install -r requirements.txt`。")
 
@@ -75,31 +355,180 @@ def convert_pdf_to_images(
     out_dir.mkdir(parents=True, exist_ok=True)
 
     image_format = image_format.lower()
-    if image_format not in {"png", "jpg", "jpeg"}:
-        raise ValueError("image_format 仅支持 'png' 或 'jpg'")
+    if image_format not in {"png", "jpg", "jpeg", "jxl"}:
+        raise ValueError("image_format 仅支持 'png'、'jpg' 或 'jxl'")
+    if image_format == 'jxl' and not jxl_available():
+        raise RuntimeError("导出 jxl 需要安装 imagecodecs 和 numpy：`pip install imagecodecs`")
     if image_format == 'jpeg':
         image_format = 'jpg'
 
+    return input_path, out_dir, image_format
+
+
+def _build_tasks(
+    input_path: Path,
+    out_dir: Path,
+    start: int,
+    end: int,
+    zoom: float,
+    alpha: bool,
+    image_format: str,
+    jpg_quality: int,
+    png_compress_level: int,
+) -> List[tuple]:
+    """One _render_page argument tuple per page in [start, end)."""
+    digits = len(str(end))
+    # 文件名模板只构造一次；stem 中的 '%' 需转义
+    name_tmpl = f"{input_path.stem.replace('%', '%%')}_p%0{digits}d.{image_format}"
+    pdf_path = str(input_path)
+    out_dir_str = str(out_dir)
+    return [
+        (
+            pdf_path,
+            i,
+            zoom,
+            alpha,
+            os.path.join(out_dir_str, name_tmpl % (i + 1)),
+            image_format,
+            jpg_quality,
+            png_compress_level,
+        )
+        for i in range(start, end)
+    ]
+
+
+def convert_pdf_to_images(
+    input_pdf: str,
+    output_dir: Optional[str] = None,
+    image_format: str = 'png',
+    zoom: float = 2.0,
+    page_range: Optional[str] = None,
+    jpg_quality: int = 92,
+    no_alpha: bool = True,
+    num_workers: Optional[int] = None,
+    png_compress_level: int = 1,
+    progress_cb: Optional[Callable[[int, int], None]] = None,
+    log_every: int = 10,
+) -> Path:
+    """Convert PDF pages to images.
+
+    - image_format: 'png', 'jpg' or 'jxl'（jxl 需要 imagecodecs）
+    - jpg_quality: jpg 与 jxl 的质量 (0-100)
+    - zoom: 1.0=72dpi 基础缩放，2.0≈144dpi，3.0≈216dpi
+    - page_range: 'start-end' or 'n' (1-based). None for all
+    - no_alpha: True to remove alpha channel (recommended for PNG)；
+      jpg 输出无论该参数如何都直接渲染为不带透明通道的 RGB
+    - png_compress_level: PNG 的 zlib 压缩级别 0-9，默认 1（最快，文件略大）
+    - num_workers: 渲染进程数，默认 min(CPU 核数, 4)；1 表示在当前进程内渲染，
+      并由写线程并行完成编码与写盘
+    - progress_cb: 每导出一页调用 progress_cb(已完成页数, 总页数)，可能在工作线程中调用
+    - log_every: 每导出多少页以 INFO 级别记录一次日志，其余页面记为 DEBUG
+
+    Returns the output directory as Path.
+    """
+    input_path, out_dir, image_format = _prepare_output(input_pdf, output_dir, image_format)
+
+    if num_workers is None:
+        num_workers = _default_num_workers()
+
     with fitz.open(str(input_path)) as doc:
         start, end = parse_page_range(page_range, doc.page_count)
-        matrix = fitz.Matrix(zoom, zoom)
 
-        digits = len(str(end))
-        for i in range(start, end):
-            page = doc.load_page(i)
-            pix = page.get_pixmap(matrix=matrix, alpha=not no_alpha)
+    alpha = not no_alpha and image_format != 'jpg'  # JPEG 无法保存透明通道
+    tasks = _build_tasks(
+        input_path, out_dir, start, end, zoom, alpha, image_format, jpg_quality, png_compress_level
+    )
+
+    if num_workers <= 1 or len(tasks) <= 1:
+        _render_pipelined(tasks, progress_cb=progress_cb, log_every=log_every)
+    else:
+        num_workers = min(num_workers, len(tasks))
+        chunksize = max(1, min(4, len(tasks) // num_workers))
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            initializer=_init_render_worker,
+            initargs=(max(1, (os.cpu_count() or 1) // num_workers),),
+        ) as executor:
+            results = executor.map(_render_page, tasks, chunksize=chunksize)
+            for done, out_file in enumerate(results, 1):
+                _log_export(out_file, done, len(tasks), log_every)
+                if progress_cb is not None:
+                    progress_cb(done, len(tasks))
+
+    logger.info("转换完成，输出目录: %s", out_dir)
+    return out_dir
+
+
+async def convert_pdf_to_images_async(
+    input_pdf: str,
+    output_dir: Optional[str] = None,
+    image_format: str = 'png',
+    zoom: float = 2.0,
+    page_range: Optional[str] = None,
+    jpg_quality: int = 92,
+    no_alpha: bool = True,
+    num_workers: int = 4,
+    png_compress_level: int = 1,
+    progress: Optional["asyncio.Queue"] = None,
+    log_every: int = 10,
+) -> Path:
+    """Async variant of convert_pdf_to_images that reports per-page progress.
+
+    渲染在单个线程内进行（fitz.Document 不是线程安全的），编码与写盘交给
+    num_workers 个线程，二者通过 run_in_executor 重叠执行。
+    progress: 每导出一页放入 (已完成页数, 总页数)，结束时（包括出错）放入 None。
+    """
+    try:
+        input_path, out_dir, image_format = _prepare_output(input_pdf, output_dir, image_format)
+        loop = asyncio.get_running_loop()
+
+        with ThreadPoolExecutor(max_workers=1) as render_pool, \
+                ThreadPoolExecutor(max_workers=num_workers) as encode_pool:
+            doc = await loop.run_in_executor(render_pool, fitz.open, str(input_path))
+            try:
+                start, end = parse_page_range(page_range, doc.page_count)
+                alpha = not no_alpha and image_format != 'jpg'  # JPEG 无法保存透明通道
+                tasks = _build_tasks(
+                    input_path, out_dir, start, end, zoom, alpha, image_format, jpg_quality,
+                    png_compress_level,
+                )
+                matrix = fitz.Matrix(zoom, zoom)
+                encode = _make_encoder(image_format, jpg_quality, png_compress_level)
+                total = len(tasks)
+                done = 0
+                # 限制已渲染但尚未写盘的 pixmap 数量
+                in_flight = asyncio.Semaphore(num_workers * 2)
 
-            page_index = i + 1
-            out_name = f"{input_path.stem}_p{page_index:0{digits}d}.{image_format}"
-            out_file = out_dir / out_name
+                def render(page_index: int):
+                    return doc.load_page(page_index).get_pixmap(
+                        matrix=matrix, colorspace=fitz.csRGB, alpha=alpha
+                    )
 
-            if image_format == 'png':
-                pix.save(str(out_file))
-            else:
-                # Save as JPEG with quality
-                pix.save(str(out_file), output='jpg', jpg_quality=jpg_quality)
+                async def export(task: tuple) -> None:
+                    nonlocal done
+                    page_index, out_path = task[1], task[4]
+                    async with in_flight:
+                        pix = await loop.run_in_executor(render_pool, render, page_index)
+                        await loop.run_in_executor(encode_pool, _save_pixmap, pix, out_path, encode)
+                    done += 1
+                    _log_export(out_path, done, total, log_every)
+                    if progress is not None:
+                        await progress.put((done, total))
 
-            logger.info("导出: %s", out_file)
+                jobs = [asyncio.ensure_future(export(task)) for task in tasks]
+                try:
+                    await asyncio.gather(*jobs)
+                except BaseException:
+                    # 一页失败时取消其余页面，避免在文档关闭后继续渲染
+                    for job in jobs:
+                        job.cancel()
+                    await asyncio.gather(*jobs, return_exceptions=True)
+                    raise
+            finally:
+                await loop.run_in_executor(render_pool, doc.close)
+    finally:
+        if progress is not None:
+            await progress.put(None)
 
     logger.info("转换完成，输出目录: %s", out_dir)
     return out_dir
@@ -108,7 +537,7 @@ def convert_pdf_to_images(
 def main() -> int:
     if len(sys.argv) < 2:
         print(
-            "用法: python pdf_to_images.py <input.pdf> [output_dir] [png|jpg] [zoom] [page_range]\n"
+            "用法: python pdf_to_images.py <input.pdf> [output_dir] [png|jpg|jxl] [zoom] [page_range]\n"
             "示例: python pdf_to_images.py file.pdf out png 2.0 1-5"
         )
         return 2
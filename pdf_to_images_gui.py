@@ -1,18 +1,25 @@
 import os
+import queue
+import asyncio
 import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from pathlib import Path
 import logging
+import logging.handlers
 
-from pdf_to_images import convert_pdf_to_images
+from pdf_to_images import convert_pdf_to_images_async, jxl_available
 
 
+_LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+_file_handler = logging.FileHandler('pdf_to_images.log', encoding='utf-8', delay=True)
+_file_handler.setFormatter(logging.Formatter(_LOG_FORMAT))
+
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
+    format=_LOG_FORMAT,
     handlers=[
-        logging.FileHandler('pdf_to_images.log', encoding='utf-8'),
+        logging.handlers.MemoryHandler(capacity=100, target=_file_handler),
         logging.StreamHandler(),
     ],
 )
@@ -23,12 +30,16 @@ class PDFToImagesGUI:
     def __init__(self) -> None:
         self.root = tk.Tk()
         self.root.title("PDF转图片工具")
-        self.root.geometry("600x420")
+        self.root.geometry("600x450")
 
         style = ttk.Style()
         style.theme_use('clam')
 
+        # 工作线程通过队列把日志/进度/状态交给 Tk 主线程，由 _drain 统一刷新界面
+        self._msg_q: "queue.Queue" = queue.Queue()
+
         self.setup_ui()
+        self.root.after(50, self._drain)
 
     def setup_ui(self) -> None:
         main = ttk.Frame(self.root, padding="10")
@@ -56,7 +67,9 @@ class PDFToImagesGUI:
 
         ttk.Label(options, text="图片格式:").grid(row=0, column=0, sticky=tk.W)
         self.format_var = tk.StringVar(value="png")
-        ttk.Combobox(options, textvariable=self.format_var, values=["png", "jpg"], width=8, state="readonly").grid(row=0, column=1, padx=(6, 16))
+        # 仅在 imagecodecs 支持 JPEG XL 时提供 jxl 选项
+        formats = ["png", "jpg", "jxl"] if jxl_available() else ["png", "jpg"]
+        ttk.Combobox(options, textvariable=self.format_var, values=formats, width=8, state="readonly").grid(row=0, column=1, padx=(6, 16))
 
         ttk.Label(options, text="缩放(1.0~4.0):").grid(row=0, column=2, sticky=tk.W)
         self.zoom_var = tk.DoubleVar(value=2.0)
@@ -70,17 +83,20 @@ class PDFToImagesGUI:
         ttk.Button(main, text="开始转换", command=self.convert).grid(row=6, column=0, pady=(8, 8))
 
         # 进度与状态
+        self.progress = ttk.Progressbar(main, mode='determinate', maximum=1)
+        self.progress.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 4))
+
         self.status_var = tk.StringVar(value="就绪")
-        ttk.Label(main, textvariable=self.status_var).grid(row=7, column=0, columnspan=3, sticky=tk.W)
+        ttk.Label(main, textvariable=self.status_var).grid(row=8, column=0, columnspan=3, sticky=tk.W)
 
         self.log = tk.Text(main, height=10, width=70)
         scroll = ttk.Scrollbar(main, orient=tk.VERTICAL, command=self.log.yview)
         self.log.configure(yscrollcommand=scroll.set)
-        self.log.grid(row=8, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S))
-        scroll.grid(row=8, column=2, sticky=(tk.N, tk.S))
+        self.log.grid(row=9, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S))
+        scroll.grid(row=9, column=2, sticky=(tk.N, tk.S))
 
         main.columnconfigure(0, weight=1)
-        main.rowconfigure(8, weight=1)
+        main.rowconfigure(9, weight=1)
 
     def pick_pdf(self) -> None:
         path = filedialog.askopenfilename(title="选择PDF文件", filetypes=[("PDF", "*.pdf"), ("所有文件", "*.*")])
@@ -97,9 +113,42 @@ class PDFToImagesGUI:
             self.output_dir_var.set(path)
 
     def append_log(self, text: str) -> None:
-        self.log.insert(tk.END, text + "\n")
-        self.log.see(tk.END)
-        self.root.update()
+        """Queue a log line; safe to call from any thread."""
+        self._msg_q.put(('log', text))
+
+    def _drain(self) -> None:
+        logged = False
+        dialogs = []
+        while True:
+            try:
+                kind, *payload = self._msg_q.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'log':
+                self.log.insert(tk.END, payload[0] + "\n")
+                logged = True
+            elif kind == 'progress':
+                done, total = payload
+                self.progress.configure(maximum=total, value=done)
+                self.status_var.set(f"正在转换... {done}/{total}")
+            elif kind == 'status':
+                self.status_var.set(payload[0])
+            elif kind == 'done':
+                self.log.insert(tk.END, f"转换完成: {payload[0]}\n")
+                logged = True
+                self.status_var.set("转换完成")
+                dialogs.append((messagebox.showinfo, "完成", f"图片已导出到: {payload[0]}"))
+            elif kind == 'error':
+                self.log.insert(tk.END, f"出错: {payload[0]}\n")
+                logged = True
+                self.status_var.set("转换失败")
+                dialogs.append((messagebox.showerror, "错误", payload[0]))
+        if logged:
+            self.log.see(tk.END)
+        self.root.after(50, self._drain)
+        # 对话框是模态的，放在重新调度之后弹出
+        for show, title, message in dialogs:
+            show(title, message)
 
     def convert(self) -> None:
         input_pdf = self.input_var.get().strip()
@@ -112,23 +161,31 @@ class PDFToImagesGUI:
             messagebox.showerror("错误", "请选择PDF文件")
             return
 
+        async def run() -> Path:
+            progress: "asyncio.Queue" = asyncio.Queue()
+            job = asyncio.ensure_future(convert_pdf_to_images_async(
+                input_pdf=input_pdf,
+                output_dir=out_dir or None,
+                image_format=img_fmt,
+                zoom=zoom,
+                page_range=rng,
+                progress=progress,
+            ))
+            while True:
+                item = await progress.get()
+                if item is None:
+                    break
+                self._msg_q.put(('progress', *item))
+            return await job
+
         def task():
             try:
-                self.status_var.set("正在转换...")
-                out = convert_pdf_to_images(
-                    input_pdf=input_pdf,
-                    output_dir=out_dir or None,
-                    image_format=img_fmt,
-                    zoom=zoom,
-                    page_range=rng,
-                )
-                self.append_log(f"转换完成: {out}")
-                self.status_var.set("转换完成")
-                messagebox.showinfo("完成", f"图片已导出到: {out}")
+                self._msg_q.put(('progress', 0, 1))
+                self._msg_q.put(('status', "正在转换..."))
+                out = asyncio.run(run())
+                self._msg_q.put(('done', str(out)))
             except Exception as e:
-                self.append_log(f"出错: {e}")
-                self.status_var.set("转换失败")
-                messagebox.showerror("错误", str(e))
+                self._msg_q.put(('error', str(e)))
 
         threading.Thread(target=task, daemon=True).start()
 
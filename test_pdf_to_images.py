@@ -0,0 +1,32 @@
+import io
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+import pdf_to_images
+
+
+def _fake_pixmap(height: int, width: int, n: int):
+    rng = np.random.default_rng(height * 100 + width * 10 + n)
+    samples = rng.integers(0, 256, size=(height, width, n), dtype=np.uint8).tobytes()
+    return SimpleNamespace(width=width, height=height, n=n, alpha=n in (2, 4), samples=samples)
+
+
+@pytest.mark.parametrize("n, mode", [(3, "RGB"), (4, "RGBA")])
+@pytest.mark.parametrize("height", [1, 7, 10, 101])
+@pytest.mark.parametrize("threads", [1, 3, 4])
+def test_encode_png_parallel_round_trip(monkeypatch, n, mode, height, threads):
+    # 行数不能被分段数整除时，各段拼接后仍须是合法的 zlib 流
+    monkeypatch.setattr(pdf_to_images, "_png_threads", threads)
+    pix = _fake_pixmap(height, 13, n)
+
+    data = pdf_to_images._encode_png_parallel(pix, 1)
+
+    im = Image.open(io.BytesIO(data))
+    im.load()
+    assert im.mode == mode
+    assert im.size == (13, height)
+    assert im.tobytes() == pix.samples
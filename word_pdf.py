@@ -1,9 +1,16 @@
 import os
 import sys
+import time
+import queue
+import shutil
 import logging
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional
-from win32com.client import Dispatch, constants
+from typing import List, Literal, Optional
+import pythoncom
+from win32com.client import Dispatch, DispatchEx, constants
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import threading
@@ -25,6 +32,7 @@ class WordToPDFConverter:
     def __init__(self):
         self.word_app = None
         self.supported_formats = ['.doc', '.docx', '.rtf']
+        self.soffice_timeout_per_file = 120  # LibreOffice批量转换时每个文件允许的秒数
     
     def _init_word_app(self):
         """初始化Word应用程序"""
@@ -34,7 +42,7 @@ class WordToPDFConverter:
             logger.info("Word应用程序启动成功")
             return True
         except Exception as e:
-            logger.error(f"启动Word应用程序失败: {str(e)}")
+            logger.error("启动Word应用程序失败: %s", e)
             return False
     
     def _cleanup_word_app(self):
@@ -45,79 +53,188 @@ class WordToPDFConverter:
                 self.word_app = None
                 logger.info("Word应用程序已关闭")
             except Exception as e:
-                logger.error(f"关闭Word应用程序时出错: {str(e)}")
+                logger.error("关闭Word应用程序时出错: %s", e)
     
     def validate_file(self, file_path: str) -> bool:
         """验证文件是否存在且格式支持"""
         if not os.path.exists(file_path):
-            logger.error(f"文件不存在: {file_path}")
+            logger.error("文件不存在: %s", file_path)
             return False
         
         file_ext = Path(file_path).suffix.lower()
         if file_ext not in self.supported_formats:
-            logger.error(f"不支持的文件格式: {file_ext}")
+            logger.error("不支持的文件格式: %s", file_ext)
             return False
         
         return True
     
-    def convert_single_file(self, input_file: str, output_file: str) -> bool:
-        """转换单个文件"""
+    def _save_as_pdf(self, word_app, input_file: str, output_file: str) -> bool:
+        """用指定的Word实例转换单个文件"""
         if not self.validate_file(input_file):
             return False
         
         # 确保输出目录存在
         output_dir = os.path.dirname(output_file)
         if output_dir and not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-            logger.info(f"创建输出目录: {output_dir}")
+            os.makedirs(output_dir, exist_ok=True)  # 批量转换时可能被其他线程同时创建
+            logger.info("创建输出目录: %s", output_dir)
         
         try:
-            if not self.word_app:
-                if not self._init_word_app():
-                    return False
-            
             # 打开文档
-            doc = self.word_app.Documents.Open(input_file)
-            logger.info(f"正在转换: {os.path.basename(input_file)}")
+            doc = word_app.Documents.Open(input_file)
+            logger.info("正在转换: %s", os.path.basename(input_file))
             
             # 转换为PDF
             doc.SaveAs(output_file, FileFormat=17)  # 17代表PDF格式
             doc.Close()
             
-            logger.info(f"转换成功: {output_file}")
+            logger.info("转换成功: %s", output_file)
             return True
             
         except Exception as e:
-            logger.error(f"转换文件失败 {input_file}: {str(e)}")
+            logger.error("转换文件失败 %s: %s", input_file, e)
             return False
     
-    def convert_batch(self, input_files: List[str], output_dir: str) -> dict:
-        """批量转换文件"""
+    def convert_single_file(self, input_file: str, output_file: str) -> bool:
+        """转换单个文件"""
+        if not self.word_app:
+            if not self._init_word_app():
+                return False
+        
+        return self._save_as_pdf(self.word_app, input_file, output_file)
+    
+    def _batch_worker(self, jobs: queue.Queue, status: list, total: int):
+        """批量转换工作线程：独立的COM套间和Word实例，依次处理队列中的文件"""
+        pythoncom.CoInitialize()
+        word_app = None
+        try:
+            while True:
+                try:
+                    index, input_file, output_file = jobs.get_nowait()
+                except queue.Empty:
+                    break
+                
+                logger.info("处理文件 %d/%d: %s", index + 1, total, os.path.basename(input_file))
+                
+                if word_app is None:
+                    try:
+                        # DispatchEx 保证每个线程启动独立的Word进程
+                        word_app = DispatchEx("Word.Application")
+                        word_app.Visible = False
+                    except Exception as e:
+                        logger.error("启动Word应用程序失败: %s", e)
+                        status[index] = False
+                        continue
+                
+                status[index] = self._save_as_pdf(word_app, input_file, output_file)
+        finally:
+            if word_app is not None:
+                try:
+                    word_app.Quit()
+                except Exception as e:
+                    logger.error("关闭Word应用程序时出错: %s", e)
+            pythoncom.CoUninitialize()
+    
+    def _convert_batch_soffice(self, input_files: List[str], output_dir: str, soffice: str) -> dict:
+        """用 LibreOffice 无界面模式批量转换：整批只启动一次 soffice"""
         results = {
             'success': [],
             'failed': [],
             'total': len(input_files)
         }
         
-        if not self._init_word_app():
-            logger.error("无法启动Word应用程序")
+        valid_files = []
+        for input_file in input_files:
+            if self.validate_file(input_file):
+                valid_files.append(input_file)
+            else:
+                results['failed'].append(input_file)
+        if not valid_files:
             return results
         
-        try:
-            for i, input_file in enumerate(input_files, 1):
-                logger.info(f"处理文件 {i}/{len(input_files)}: {os.path.basename(input_file)}")
-                
-                # 生成输出文件名
-                input_name = Path(input_file).stem
-                output_file = os.path.join(output_dir, f"{input_name}.pdf")
-                
-                if self.convert_single_file(input_file, output_file):
-                    results['success'].append(output_file)
-                else:
-                    results['failed'].append(input_file)
+        os.makedirs(output_dir, exist_ok=True)
+        logger.info("使用LibreOffice批量转换 %d 个文件", len(valid_files))
         
+        # 使用独立的临时用户配置：否则已打开的LibreOffice会接管任务而不输出文件
+        profile_dir = tempfile.mkdtemp(prefix="soffice_profile_")
+        started = time.time()
+        try:
+            subprocess.run(
+                [soffice, f"-env:UserInstallation={Path(profile_dir).as_uri()}",
+                 "--headless", "--convert-to", "pdf", "--outdir", output_dir, *valid_files],
+                check=True,
+                stdout=subprocess.DEVNULL,
+                timeout=self.soffice_timeout_per_file * len(valid_files),
+            )
+        except subprocess.TimeoutExpired:
+            logger.error("LibreOffice转换超时，已终止")
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.error("LibreOffice转换出错: %s", e)
         finally:
-            self._cleanup_word_app()
+            shutil.rmtree(profile_dir, ignore_errors=True)
+        
+        # soffice 对单个文件失败不会改变退出码，逐个检查输出文件
+        for input_file in valid_files:
+            output_file = os.path.join(output_dir, f"{Path(input_file).stem}.pdf")
+            if os.path.exists(output_file) and os.path.getmtime(output_file) >= started - 1:
+                logger.info("转换成功: %s", output_file)
+                results['success'].append(output_file)
+            else:
+                logger.error("转换文件失败 %s", input_file)
+                results['failed'].append(input_file)
+        
+        return results
+    
+    def convert_batch(self, input_files: List[str], output_dir: str,
+                      max_workers: Optional[int] = None,
+                      backend: Literal["word", "soffice"] = "word") -> dict:
+        """批量转换文件
+        
+        max_workers: 并行的Word实例数，默认 CPU核数//2（至少1个）
+        backend: "word" 使用Word COM；"soffice" 使用LibreOffice无界面模式，
+                 未找到 soffice 时回退为Word
+        """
+        results = {
+            'success': [],
+            'failed': [],
+            'total': len(input_files)
+        }
+        if not input_files:
+            return results
+        
+        if backend == "soffice":
+            soffice = shutil.which("soffice")
+            if soffice:
+                return self._convert_batch_soffice(input_files, output_dir, soffice)
+            logger.warning("未找到 soffice，改用Word转换")
+        
+        if max_workers is None:
+            max_workers = (os.cpu_count() or 2) // 2 or 1
+        max_workers = max(1, min(max_workers, len(input_files)))
+        
+        jobs = queue.Queue()
+        output_files = []
+        for i, input_file in enumerate(input_files):
+            # 生成输出文件名
+            input_name = Path(input_file).stem
+            output_file = os.path.join(output_dir, f"{input_name}.pdf")
+            output_files.append(output_file)
+            jobs.put((i, input_file, output_file))
+        
+        status = [False] * len(input_files)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self._batch_worker, jobs, status, len(input_files))
+                for _ in range(max_workers)
+            ]
+            for future in futures:
+                future.result()
+        
+        for input_file, output_file, ok in zip(input_files, output_files, status):
+            if ok:
+                results['success'].append(output_file)
+            else:
+                results['failed'].append(input_file)
         
         return results
     